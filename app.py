@@ -16,48 +16,46 @@
 
 from worker.logger import initLogger
 from worker.configuration import conf
-from worker import handlers
 from worker import api
 import falcon
 
 
 initLogger(conf.Logger.level)
 
-db_handler = handlers.DB(st_path=conf.Storage.db_path)
-data_handler = handlers.Data(
-    st_path=conf.Storage.data_cache_path,
-    data_api_url=conf.Data.api_url,
-    max_age=conf.Data.max_age
-)
-jobs_handler = handlers.Jobs(
-    db_handler=db_handler,
-    data_handler=data_handler,
-    check_delay=conf.Jobs.check,
-    max_jobs=conf.Jobs.max_num
-)
-skd_handler = handlers.Scheduler(
-    job_handler=jobs_handler,
-    db_handler=db_handler,
-    data_handler=data_handler,
-    delay=conf.Jobs.skd_delay
-)
+if conf.Engine.remote:
+    from worker import ipc
+
+    authkey = conf.Engine.authkey.encode()
+    db_handler = ipc.DBClient(socket_path=conf.Engine.socket_path, authkey=authkey)
+    jobs_handler = ipc.JobsClient(socket_path=conf.Engine.socket_path, authkey=authkey)
+    metrics_client = ipc.MetricsClient(socket_path=conf.Engine.socket_path, authkey=authkey)
+    render_metrics = metrics_client.render
+    ipc.MetricsPusher(metrics_client=metrics_client).start()
+    engine = None
+else:
+    from worker.engine import Engine
+    from worker import metrics
+
+    engine = Engine()
+    db_handler = engine.db_handler
+    jobs_handler = engine.jobs_handler
+    render_metrics = metrics.registry.render
 
-app = falcon.API()
+app = falcon.API(middleware=[api.MetricsMiddleware()])
 
 app.req_options.strip_url_path_trailing_slash = True
 
 routes = (
     ("/weibull", api.WeibullCollection(db_handler=db_handler, jobs_handler=jobs_handler)),
     ("/weibull/{weibull_id}", api.WeibullResource(db_handler=db_handler)),
+    ("/weibull/{weibull_id}/codes/{code}", api.WeibullCode(db_handler=db_handler)),
     ("/jobs", api.Jobs(db_handler=db_handler, jobs_handler=jobs_handler)),
-    ("/jobs/{job_id}", api.Job(db_handler=db_handler, jobs_handler=jobs_handler))
+    ("/jobs/{job_id}", api.Job(db_handler=db_handler, jobs_handler=jobs_handler)),
+    ("/metrics", api.Metrics(render=render_metrics))
 )
 
 for route in routes:
     app.add_route(*route)
 
-data_handler.purge_cache()
-jobs_handler.start()
-data_handler.start()
-if conf.Jobs.skd_enabled:
-    skd_handler.start()
+if engine:
+    engine.start()
@@ -0,0 +1,94 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+# End-to-end benchmarks against a local stand-in of the data service.
+#
+#   python -m bench --services 4 --rows 200000 --chunks 4 --output result.json
+#   python -m bench jobs api --compare result.json
+
+from worker.logger import initLogger
+from .scenarios import scenarios, Environment
+import multiprocessing
+import argparse
+import json
+import sys
+
+
+def run_scenario(name: str, args, result_queue: multiprocessing.Queue):
+    try:
+        result_queue.put(scenarios[name](Environment(args)))
+    except Exception as ex:
+        result_queue.put(dict(error=str(ex)))
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    items = dict()
+    for key, value in result.items():
+        if isinstance(value, dict):
+            items.update(flatten(value, "{}{}.".format(prefix, key)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items["{}{}".format(prefix, key)] = value
+    return items
+
+
+def compare(results: dict, baseline: dict):
+    current = flatten(results["scenarios"])
+    previous = flatten(baseline["scenarios"])
+    for key in sorted(current.keys() & previous.keys()):
+        change = (current[key] - previous[key]) / previous[key] * 100 if previous[key] else 0
+        print("{:<48} {:>16.4f} {:>16.4f} {:>+9.1f}%".format(key, previous[key], current[key], change))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=", ".join(scenarios.keys()))
+    parser.add_argument("--services", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=100000, help="rows per service")
+    parser.add_argument("--chunks", type=int, default=4, help="chunks per service")
+    parser.add_argument("--error-cols", type=int, default=2)
+    parser.add_argument("--error-freq", type=float, default=0.1)
+    parser.add_argument("--error-codes", type=int, nargs="+", default=[1101, 1102, 1202])
+    parser.add_argument("--plain", dest="compressed", action="store_false", help="serve chunks uncompressed")
+    parser.add_argument("--compressed-cache", action="store_true")
+    parser.add_argument("--rate", type=int, default=0, help="limit bandwidth of data service in bytes per second")
+    parser.add_argument("--weibulls", type=int, default=0, help="limit number of weibull resources")
+    parser.add_argument("--max-jobs", type=int, default=4)
+    parser.add_argument("--skd-delay", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--log-level", default="critical")
+    parser.add_argument("--output", help="write results to file")
+    parser.add_argument("--compare", help="compare results with previous output")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in scenarios:
+            parser.error("unknown scenario '{}'".format(name))
+    initLogger(args.log_level)
+    results = dict(params={key: value for key, value in vars(args).items() if key not in ("output", "compare")}, scenarios=dict())
+    for name in args.scenarios or scenarios.keys():
+        result_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_scenario, args=(name, args, result_queue))
+        process.start()
+        results["scenarios"][name] = result_queue.get()
+        process.join()
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare(results, json.load(file))
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
@@ -0,0 +1,72 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+# Compare disk usage and cpu time of an uncompressed and a compressed data cache.
+#
+#   python -m bench.cache_compression --rows 1000000 --chunks 10
+
+from worker.handlers.data import Data
+from worker.handlers.jobs import ConcatenatedFile
+from .data_service import DataService
+from .datagen import generate_chunks
+from .scenarios import dir_size
+import pandas
+import argparse
+import tempfile
+import json
+import time
+
+
+source_id = "bench-source"
+
+
+def run(url: str, compressed_cache: bool) -> dict:
+    with tempfile.TemporaryDirectory() as st_path:
+        data_handler = Data(st_path=st_path, data_api_url=url, max_age=1800, compressed_cache=compressed_cache)
+        cpu_start = time.process_time()
+        files, time_field, _, compressed = data_handler.get(source_id)
+        cpu_get = time.process_time() - cpu_start
+        cache_bytes = dir_size(st_path)
+        cpu_start = time.process_time()
+        input_path = ConcatenatedFile(files=files, compressed=compressed).build_input()
+        cpu_build = time.process_time() - cpu_start
+        disk_bytes = dir_size(st_path)
+        cpu_start = time.process_time()
+        rows = len(pandas.read_csv(input_path, usecols=[time_field]))
+        cpu_parse = time.process_time() - cpu_start
+    return dict(
+        compressed_cache=compressed_cache,
+        rows=rows,
+        cache_bytes=cache_bytes,
+        disk_bytes=disk_bytes,
+        cpu_get=cpu_get,
+        cpu_build_input=cpu_build,
+        cpu_parse=cpu_parse,
+        cpu_total=cpu_get + cpu_build + cpu_parse
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+    columns, chunks = generate_chunks(rows=args.rows, chunks=args.chunks, compressed=True)
+    data_service = DataService()
+    data_service.add_source(source_id=source_id, columns=columns, chunks=chunks, compressed=True)
+    data_service.start()
+    print(json.dumps([run(data_service.url, False), run(data_service.url, True)], indent=4))
+    data_service.stop()
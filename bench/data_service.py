@@ -0,0 +1,122 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("DataService",)
+
+
+import multiprocessing
+import http.server
+import time
+import hashlib
+import typing
+import json
+import urllib.parse
+
+
+# serves metadata via '/{source_id}' and chunks via '/{source_id}/files/{file}'
+class DataService:
+    def __init__(self, rate: int = 0):
+        self.__rate = rate
+        self.__sources: typing.Dict[str, typing.Tuple[bytes, typing.Dict[str, bytes]]] = dict()
+        self.__bytes_sent = multiprocessing.Value("Q", 0)
+        self.__requests = multiprocessing.Value("Q", 0)
+        self.__process: typing.Optional[multiprocessing.Process] = None
+        self.__port = None
+
+    def add_source(self, source_id: str, columns: list, chunks: typing.List[bytes], compressed: bool, time_field: str = "time"):
+        files = {"{}_{}".format(len(self.__sources), num): chunk for num, chunk in enumerate(chunks)}
+        checksum = hashlib.sha256()
+        for chunk in chunks:
+            checksum.update(chunk)
+        metadata = dict(
+            source_id=source_id,
+            time_field=time_field,
+            delimiter=",",
+            columns=columns,
+            files=list(files.keys()),
+            checksum=checksum.hexdigest(),
+            compressed=compressed
+        )
+        self.__sources[source_id] = (json.dumps(metadata).encode(), files)
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{}".format(self.__port)
+
+    @property
+    def pid(self) -> int:
+        return self.__process.pid
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.__bytes_sent.value
+
+    @property
+    def requests(self) -> int:
+        return self.__requests.value
+
+    def __serve(self, port_queue: multiprocessing.Queue):
+        sources = self.__sources
+        bytes_sent = self.__bytes_sent
+        requests = self.__requests
+        rate = self.__rate
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = [urllib.parse.unquote(part) for part in self.path.strip("/").split("/")]
+                try:
+                    metadata, files = sources[parts[0]]
+                    body = metadata if len(parts) == 1 else files[parts[2]]
+                except (KeyError, IndexError):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if rate:
+                    # throttle to simulate network bandwidth, a block is sent once it would have arrived at the given rate
+                    start = time.perf_counter()
+                    for pos in range(0, len(body), 65536):
+                        block = body[pos:pos + 65536]
+                        delay = start + (pos + len(block)) / rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                        self.wfile.write(block)
+                else:
+                    self.wfile.write(body)
+                with bytes_sent.get_lock():
+                    bytes_sent.value += len(body)
+                with requests.get_lock():
+                    requests.value += 1
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        port_queue.put(server.server_address[1])
+        server.serve_forever()
+
+    def start(self):
+        port_queue = multiprocessing.Queue()
+        self.__process = multiprocessing.Process(target=self.__serve, args=(port_queue,), daemon=True)
+        self.__process.start()
+        self.__port = port_queue.get(timeout=10)
+
+    def stop(self):
+        self.__process.terminate()
+        self.__process.join()
@@ -0,0 +1,47 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("generate_rows", "generate_chunks")
+
+
+import random
+import gzip
+import typing
+
+
+def generate_rows(rows: int, error_cols: int = 2, error_freq: float = 0.1, error_codes: typing.Sequence[int] = (1101, 1102, 1202), seed: int = 0) -> typing.Iterator[str]:
+    rand = random.Random(seed)
+    ts = 1600000000000
+    for _ in range(rows):
+        ts += rand.randint(1000, 60000)
+        yield ",".join([str(ts)] + [str(rand.choice(error_codes)) if rand.random() < error_freq else "0" for _ in range(error_cols)])
+
+
+def generate_chunks(rows: int, chunks: int = 1, error_cols: int = 2, error_freq: float = 0.1, error_codes: typing.Sequence[int] = (1101, 1102, 1202), compressed: bool = True, seed: int = 0) -> typing.Tuple[typing.List[str], typing.List[bytes]]:
+    columns = ["time"] + ["module_{}_errorcode".format(num) for num in range(1, error_cols + 1)]
+    row_gen = generate_rows(rows=rows, error_cols=error_cols, error_freq=error_freq, error_codes=error_codes, seed=seed)
+    rows_per_chunk = -(-rows // chunks)
+    data = list()
+    for num in range(chunks):
+        lines = list() if num else [",".join(columns)]
+        for _ in range(rows_per_chunk):
+            try:
+                lines.append(next(row_gen))
+            except StopIteration:
+                break
+        chunk = ("\n".join(lines) + "\n").encode()
+        data.append(gzip.compress(chunk) if compressed else chunk)
+    return columns, data
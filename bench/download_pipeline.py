@@ -0,0 +1,81 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+# Compare throughput of the pipelined chunk download with the sequential download loop.
+#
+#   python -m bench.download_pipeline --rows 2000000 --chunks 4 --buffer-sizes 16384 65536 262144 --rate 50000000
+
+from worker.handlers.data import Data
+from .data_service import DataService
+from .datagen import generate_chunks
+import argparse
+import tempfile
+import json
+import time
+
+
+source_id = "bench-source"
+
+
+def run(url: str, size: int, pipelined: bool, buffer_size: int, compressed_cache: bool, repeat: int) -> dict:
+    wall = list()
+    cpu = list()
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as st_path:
+            data_handler = Data(
+                st_path=st_path,
+                data_api_url=url,
+                max_age=1800,
+                compressed_cache=compressed_cache,
+                buffer_size=buffer_size,
+                pipelined=pipelined
+            )
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            data_handler.get(source_id)
+            cpu.append(time.process_time() - cpu_start)
+            wall.append(time.perf_counter() - wall_start)
+    return dict(
+        pipelined=pipelined,
+        buffer_size=buffer_size,
+        compressed_cache=compressed_cache,
+        wall_time=min(wall),
+        cpu_time=min(cpu),
+        throughput=size / min(wall)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--buffer-sizes", type=int, nargs="+", default=[16384, 65536, 262144, 1048576])
+    parser.add_argument("--plain", dest="compressed", action="store_false", help="serve chunks uncompressed")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rate", type=int, default=0, help="limit bandwidth of data service in bytes per second")
+    args = parser.parse_args()
+    columns, chunks = generate_chunks(rows=args.rows, chunks=args.chunks, compressed=args.compressed)
+    data_service = DataService(rate=args.rate)
+    data_service.add_source(source_id=source_id, columns=columns, chunks=chunks, compressed=args.compressed)
+    data_service.start()
+    size = sum(len(chunk) for chunk in chunks)
+    results = list()
+    for compressed_cache in ((False, True) if args.compressed else (False,)):
+        for buffer_size in args.buffer_sizes:
+            for pipelined in (False, True):
+                results.append(run(data_service.url, size, pipelined, buffer_size, compressed_cache, args.repeat))
+    print(json.dumps(results, indent=4))
+    data_service.stop()
@@ -0,0 +1,302 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("scenarios", "Environment")
+
+
+from worker import handlers, models, util, api
+from .data_service import DataService
+from .datagen import generate_chunks
+import falcon
+import falcon.testing
+import multiprocessing
+import threading
+import tempfile
+import resource
+import shutil
+import typing
+import json
+import time
+import os
+
+
+def percentiles(values: typing.List[float]) -> dict:
+    if not values:
+        return dict()
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+    return dict(p50=rank(50), p90=rank(90), p99=rank(99), max=values[-1], mean=sum(values) / len(values))
+
+
+def read_wchar(pid: typing.Union[int, str]) -> int:
+    try:
+        with open("/proc/{}/io".format(pid), "r") as file:
+            for line in file:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return 0
+
+
+def dir_size(path: str) -> int:
+    size = 0
+    for file in os.listdir(path):
+        try:
+            size += os.path.getsize(os.path.join(path, file))
+        except FileNotFoundError:
+            pass
+    return size
+
+
+class Sampler(threading.Thread):
+    def __init__(self, st_path: str, exclude: typing.Sequence[int], interval: float = 0.05):
+        super().__init__(name="bench-sampler", daemon=True)
+        self.__st_path = st_path
+        self.__exclude = set(exclude)
+        self.__interval = interval
+        self.__stop = threading.Event()
+        self.__wchar_self = read_wchar("self")
+        self.__wchar_children: typing.Dict[int, int] = dict()
+        self.peak_disk = 0
+        self.peak_rss_worker = 0
+
+    def __sample(self):
+        self.peak_disk = max(self.peak_disk, dir_size(self.__st_path))
+        for child in multiprocessing.active_children():
+            if child.pid not in self.__exclude:
+                self.__wchar_children[child.pid] = read_wchar(child.pid) or self.__wchar_children.get(child.pid, 0)
+                self.peak_rss_worker = max(self.peak_rss_worker, util.get_rss(child.pid))
+
+    def run(self):
+        while not self.__stop.is_set():
+            self.__sample()
+            time.sleep(self.__interval)
+
+    def stop(self) -> dict:
+        self.__stop.set()
+        self.join()
+        self.__sample()
+        return dict(
+            bytes_written=read_wchar("self") - self.__wchar_self + sum(self.__wchar_children.values()),
+            peak_disk_bytes=self.peak_disk,
+            peak_rss_worker=self.peak_rss_worker
+        )
+
+
+class Environment:
+    def __init__(self, args):
+        self.args = args
+        self.tmp_path = tempfile.mkdtemp(prefix="weibull-bench-")
+        self.db_path = os.path.join(self.tmp_path, "db")
+        self.st_path = os.path.join(self.tmp_path, "data_cache")
+        os.mkdir(self.db_path)
+        os.mkdir(self.st_path)
+        self.data_service = DataService(rate=args.rate)
+        self.services = list()
+        for num in range(args.services):
+            columns, chunks = generate_chunks(
+                rows=args.rows,
+                chunks=args.chunks,
+                error_cols=args.error_cols,
+                error_freq=args.error_freq,
+                error_codes=args.error_codes,
+                compressed=args.compressed,
+                seed=num
+            )
+            service_id = "urn:bench:service:{}".format(num)
+            self.data_service.add_source(source_id=service_id, columns=columns, chunks=chunks, compressed=args.compressed)
+            self.services.append((service_id, columns[1:]))
+        self.data_service.start()
+        self.db_handler = handlers.DB(st_path=self.db_path)
+        self.data_handler = handlers.Data(
+            st_path=self.st_path,
+            data_api_url=self.data_service.url,
+            max_age=1800,
+            compressed_cache=args.compressed_cache
+        )
+        self.jobs_handler = handlers.Jobs(
+            db_handler=self.db_handler,
+            data_handler=self.data_handler,
+            check_delay=0.1,
+            max_jobs=args.max_jobs
+        )
+        self.sampler = Sampler(st_path=self.st_path, exclude=(self.data_service.pid,))
+
+    def weibull_requests(self) -> typing.List[models.WeibullRequest]:
+        requests = list()
+        for service_id, error_cols in self.services:
+            for col in error_cols:
+                for code in self.args.error_codes:
+                    requests.append(models.WeibullRequest(service_id=service_id, config=dict(target_col=col, target_error_code=code)))
+        return requests[:self.args.weibulls] if self.args.weibulls else requests
+
+    def put_weibull(self, weibull_req: models.WeibullRequest) -> str:
+        w_id = util.get_hash(weibull_req.service_id, weibull_req.config)
+        weibull = models.Weibull(dict(weibull_req), id=w_id, config=weibull_req.config)
+        self.db_handler.put(b"weibull-", weibull.id.encode(), json.dumps(dict(weibull)).encode())
+        return w_id
+
+    def wait_for_jobs(self, job_ids: typing.Dict[str, float], timeout: float) -> typing.Dict[str, typing.Tuple[float, str]]:
+        done = dict()
+        deadline = time.time() + timeout
+        while len(done) < len(job_ids) and time.time() < deadline:
+            for job_id in job_ids:
+                if job_id not in done:
+                    try:
+                        job = json.loads(self.db_handler.get(b"jobs-", job_id.encode()))
+                        done[job_id] = (time.time(), job["status"])
+                    except KeyError:
+                        pass
+            time.sleep(0.02)
+        return done
+
+    def start(self):
+        self.jobs_handler.start()
+        self.sampler.start()
+
+    def stop(self) -> dict:
+        stats = self.sampler.stop()
+        stats["bytes_downloaded"] = self.data_service.bytes_sent
+        stats["peak_rss_main"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        stats["peak_rss_worker"] = max(stats["peak_rss_worker"], resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+        self.data_service.stop()
+        self.db_handler.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        return stats
+
+
+def job_stats(submitted: typing.Dict[str, float], done: typing.Dict[str, typing.Tuple[float, str]], started: float) -> dict:
+    latencies = [done[job_id][0] - submitted[job_id] for job_id in done]
+    duration = max(done[job_id][0] for job_id in done) - started if done else 0
+    return dict(
+        jobs=len(submitted),
+        jobs_completed=len(done),
+        jobs_failed=len([job_id for job_id in done if done[job_id][1] != models.JobStatus.finished]),
+        duration=duration,
+        jobs_per_minute=len(done) / duration * 60 if duration else 0,
+        latency=percentiles(latencies)
+    )
+
+
+def scenario_data(env: Environment) -> dict:
+    env.start()
+    cold = list()
+    warm = list()
+    for service_id, _ in env.services:
+        start = time.perf_counter()
+        env.data_handler.get(service_id)
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        env.data_handler.get(service_id)
+        warm.append(time.perf_counter() - start)
+    result = env.stop()
+    result.update(
+        get_cold=percentiles(cold),
+        get_warm=percentiles(warm),
+        download_throughput=result["bytes_downloaded"] / sum(cold) if cold else 0
+    )
+    return result
+
+
+def scenario_jobs(env: Environment) -> dict:
+    weibull_ids = [env.put_weibull(weibull_req) for weibull_req in env.weibull_requests()]
+    env.start()
+    started = time.time()
+    submitted = dict()
+    for weibull_id in weibull_ids:
+        submitted[env.jobs_handler.create(weibull_id)] = time.time()
+    done = env.wait_for_jobs(submitted, env.args.timeout)
+    result = job_stats(submitted, done, started)
+    result.update(env.stop())
+    return result
+
+
+def scenario_scheduler(env: Environment) -> dict:
+    weibull_ids = [env.put_weibull(weibull_req) for weibull_req in env.weibull_requests()]
+    skd_handler = handlers.Scheduler(
+        job_handler=env.jobs_handler,
+        db_handler=env.db_handler,
+        data_handler=env.data_handler,
+        delay=env.args.skd_delay
+    )
+    env.start()
+    started = time.time()
+    skd_handler.start()
+    submitted = dict()
+    deadline = time.time() + env.args.timeout
+    while len(submitted) < len(weibull_ids) and time.time() < deadline:
+        for job_id in env.jobs_handler.list_jobs():
+            if job_id not in submitted:
+                submitted[job_id] = time.time()
+        time.sleep(0.01)
+    done = env.wait_for_jobs(submitted, max(deadline - time.time(), 0))
+    result = job_stats(submitted, done, started)
+    result.update(env.stop())
+    return result
+
+
+def scenario_api(env: Environment) -> dict:
+    app = falcon.API(middleware=[api.MetricsMiddleware()])
+    app.req_options.strip_url_path_trailing_slash = True
+    app.add_route("/weibull", api.WeibullCollection(db_handler=env.db_handler, jobs_handler=env.jobs_handler))
+    app.add_route("/weibull/{weibull_id}", api.WeibullResource(db_handler=env.db_handler))
+    app.add_route("/weibull/{weibull_id}/codes/{code}", api.WeibullCode(db_handler=env.db_handler))
+    app.add_route("/jobs", api.Jobs(db_handler=env.db_handler, jobs_handler=env.jobs_handler))
+    app.add_route("/jobs/{job_id}", api.Job(db_handler=env.db_handler, jobs_handler=env.jobs_handler))
+    app.add_route("/metrics", api.Metrics())
+    client = falcon.testing.TestClient(app)
+    request_latency = dict(post_weibull=list(), post_jobs=list(), get_job=list(), get_jobs=list(), get_metrics=list())
+
+    def timed(name, method, path, **kwargs):
+        start = time.perf_counter()
+        resp = client.simulate_request(method, path, **kwargs)
+        request_latency[name].append(time.perf_counter() - start)
+        return resp
+
+    env.start()
+    started = time.time()
+    submitted = dict()
+    for weibull_req in env.weibull_requests():
+        weibull_id = timed("post_weibull", "POST", "/weibull", json=dict(weibull_req)).text
+        job_id = timed("post_jobs", "POST", "/jobs", json=dict(weibull_id=weibull_id)).text
+        submitted[job_id] = time.time()
+    done = dict()
+    deadline = time.time() + env.args.timeout
+    while len(done) < len(submitted) and time.time() < deadline:
+        timed("get_jobs", "GET", "/jobs")
+        timed("get_metrics", "GET", "/metrics")
+        for job_id in submitted:
+            if job_id not in done:
+                job = timed("get_job", "GET", "/jobs/{}".format(job_id)).json
+                if job and job["status"] not in (models.JobStatus.pending, models.JobStatus.running):
+                    done[job_id] = (time.time(), job["status"])
+        time.sleep(0.02)
+    result = job_stats(submitted, done, started)
+    result["request_latency"] = {key: percentiles(value) for key, value in request_latency.items()}
+    result.update(env.stop())
+    return result
+
+
+scenarios = {
+    "data": scenario_data,
+    "jobs": scenario_jobs,
+    "scheduler": scenario_scheduler,
+    "api": scenario_api
+}
@@ -0,0 +1,35 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from worker.logger import initLogger
+from worker.configuration import conf
+from worker.engine import Engine
+from worker import ipc
+
+
+initLogger(conf.Logger.level)
+
+engine = Engine()
+ipc_server = ipc.Server(
+    socket_path=conf.Engine.socket_path,
+    authkey=conf.Engine.authkey.encode(),
+    db_handler=engine.db_handler,
+    jobs_handler=engine.jobs_handler
+)
+
+engine.start()
+ipc_server.start()
+ipc_server.join()
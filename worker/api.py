@@ -14,15 +14,19 @@
    limitations under the License.
 """
 
-__all__ = ("WeibullResource", "WeibullCollection", "Jobs", "Job")
+__all__ = ("WeibullResource", "WeibullCode", "WeibullCollection", "Jobs", "Job", "Metrics", "MetricsMiddleware")
 
 
 from .logger import getLogger
 from . import handlers
 from . import models
 from . import util
+from . import metrics
+from . import series
 import falcon
 import json
+import time
+import typing
 
 
 logger = getLogger(__name__.split(".", 1)[-1])
@@ -55,6 +59,8 @@ class WeibullCollection:
         reqDebugLog(req)
         try:
             weibull_req = models.WeibullRequest(json.load(req.bounded_stream))
+            if "windows" in weibull_req.config:
+                series.validate_windows(weibull_req.config["windows"])
             w_id = util.get_hash(weibull_req.service_id, weibull_req.config)
             try:
                 self.__db_handler.get(b"weibull-", w_id.encode())
@@ -62,10 +68,13 @@ class WeibullCollection:
             except KeyError:
                 weibull = models.Weibull(dict(weibull_req), id=w_id, config=weibull_req.config)
                 self.__db_handler.put(b"weibull-", weibull.id.encode(), json.dumps(dict(weibull)).encode())
-                self.__jobs_handler.create(weibull_id=weibull.id)
+                self.__jobs_handler.create(weibull_id=weibull.id, priority=models.JobPriority.new)
                 resp.status = falcon.HTTP_201
             resp.content_type = falcon.MEDIA_TEXT
             resp.body = w_id
+        except ValueError as ex:
+            resp.status = falcon.HTTP_400
+            reqErrorLog(req, ex)
         except Exception as ex:
             resp.status = falcon.HTTP_500
             reqErrorLog(req, ex)
@@ -98,6 +107,27 @@ class WeibullResource:
             reqErrorLog(req, ex)
 
 
+class WeibullCode:
+    def __init__(self, db_handler: handlers.DB):
+        self.__db_handler = db_handler
+
+    def on_get(self, req: falcon.request.Request, resp: falcon.response.Response, weibull_id: str, code: str):
+        reqDebugLog(req)
+        try:
+            weibull_item = models.Weibull(json.loads(self.__db_handler.get(b"weibull-", weibull_id.encode())))
+            if "target_error_code" in weibull_item.config or not weibull_item.result or code not in weibull_item.result:
+                raise KeyError(code)
+            resp.content_type = falcon.MEDIA_JSON
+            resp.body = json.dumps(weibull_item.result[code])
+            resp.status = falcon.HTTP_200
+        except KeyError as ex:
+            resp.status = falcon.HTTP_404
+            reqErrorLog(req, ex)
+        except Exception as ex:
+            resp.status = falcon.HTTP_500
+            reqErrorLog(req, ex)
+
+
 class Jobs:
     def __init__(self, db_handler: handlers.DB, jobs_handler: handlers.Jobs):
         self.__db_handler = db_handler
@@ -107,9 +137,24 @@ class Jobs:
         reqDebugLog(req)
         try:
             req_body = json.load(req.bounded_stream)
-            resp.body = self.__jobs_handler.create(req_body["weibull_id"])
+            if not isinstance(req_body.get("weibull_id"), str):
+                raise ValueError("weibull_id required")
+            timeout = req_body.get("timeout")
+            if timeout is not None and not util.is_timeout(timeout):
+                raise ValueError("timeout must be a positive number")
+            resp.body = self.__jobs_handler.create(
+                weibull_id=req_body["weibull_id"],
+                timeout=timeout,
+                profile=req_body.get("profile", False)
+            )
             resp.content_type = falcon.MEDIA_TEXT
             resp.status = falcon.HTTP_200
+        except KeyError as ex:
+            resp.status = falcon.HTTP_404
+            reqErrorLog(req, ex)
+        except ValueError as ex:
+            resp.status = falcon.HTTP_400
+            reqErrorLog(req, ex)
         except Exception as ex:
             resp.status = falcon.HTTP_500
             reqErrorLog(req, ex)
@@ -150,3 +195,43 @@ class Job:
         except Exception as ex:
             resp.status = falcon.HTTP_500
             reqErrorLog(req, ex)
+
+    def on_delete(self, req: falcon.request.Request, resp: falcon.response.Response, job_id):
+        reqDebugLog(req)
+        try:
+            self.__jobs_handler.cancel(job_id)
+            resp.status = falcon.HTTP_200
+        except KeyError as ex:
+            resp.status = falcon.HTTP_404
+            reqErrorLog(req, ex)
+        except Exception as ex:
+            resp.status = falcon.HTTP_500
+            reqErrorLog(req, ex)
+
+
+class Metrics:
+    def __init__(self, render: typing.Callable[[], str] = metrics.registry.render):
+        self.__render = render
+
+    def on_get(self, req: falcon.request.Request, resp: falcon.response.Response):
+        reqDebugLog(req)
+        try:
+            resp.content_type = "text/plain; version=0.0.4"
+            resp.body = self.__render()
+            resp.status = falcon.HTTP_200
+        except Exception as ex:
+            resp.status = falcon.HTTP_500
+            reqErrorLog(req, ex)
+
+
+class MetricsMiddleware:
+    def process_request(self, req: falcon.request.Request, resp: falcon.response.Response):
+        req.context.start = time.perf_counter()
+
+    def process_response(self, req: falcon.request.Request, resp: falcon.response.Response, resource, req_succeeded: bool):
+        metrics.http_duration.observe(
+            time.perf_counter() - req.context.start,
+            method=req.method,
+            resource=type(resource).__name__ if resource else "none",
+            status=resp.status.split(" ", 1)[0]
+        )
@@ -31,18 +31,33 @@ class Conf:
     class Storage:
         db_path = "/db"
         data_cache_path = "/data_cache"
+        profile_path = "/profiles"
 
     @simple_env_var.section
     class Data:
         api_url = "http://test"
         max_age = 1800
+        compressed_cache = False
+        buffer_size = 65536
+        pipelined = False
 
     @simple_env_var.section
     class Jobs:
         max_num = 5
+        max_cores = 0
+        max_mem = 0
+        job_mem_limit = 0
+        timeout = 0
+        profile = ""
         check = 5
         skd_delay = 600
         skd_enabled = True
 
+    @simple_env_var.section
+    class Engine:
+        remote = False
+        socket_path = "/engine/engine.sock"
+        authkey = ""
+
 
 conf = Conf(load=False)
@@ -0,0 +1,60 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("Engine",)
+
+
+from .configuration import conf
+from . import handlers
+
+
+class Engine:
+    def __init__(self):
+        self.db_handler = handlers.DB(st_path=conf.Storage.db_path)
+        self.data_handler = handlers.Data(
+            st_path=conf.Storage.data_cache_path,
+            data_api_url=conf.Data.api_url,
+            max_age=conf.Data.max_age,
+            compressed_cache=conf.Data.compressed_cache,
+            buffer_size=conf.Data.buffer_size,
+            pipelined=conf.Data.pipelined
+        )
+        self.jobs_handler = handlers.Jobs(
+            db_handler=self.db_handler,
+            data_handler=self.data_handler,
+            check_delay=conf.Jobs.check,
+            max_jobs=conf.Jobs.max_num,
+            max_cores=conf.Jobs.max_cores,
+            max_mem=conf.Jobs.max_mem,
+            job_mem_limit=conf.Jobs.job_mem_limit,
+            timeout=conf.Jobs.timeout,
+            profile_path=conf.Storage.profile_path,
+            profile_services=[service_id.strip() for service_id in conf.Jobs.profile.split(",") if service_id.strip()]
+        )
+        self.skd_handler = handlers.Scheduler(
+            job_handler=self.jobs_handler,
+            db_handler=self.db_handler,
+            data_handler=self.data_handler,
+            delay=conf.Jobs.skd_delay
+        )
+
+    def start(self):
+        self.data_handler.purge_cache()
+        self.jobs_handler.recover()
+        self.jobs_handler.start()
+        self.data_handler.start()
+        if conf.Jobs.skd_enabled:
+            self.skd_handler.start()
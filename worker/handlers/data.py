@@ -18,7 +18,7 @@ __all__ = ("Data", )
 
 
 from ..logger import getLogger
-from .. import util, models
+from .. import util, models, metrics
 import requests
 import os
 import time
@@ -37,19 +37,34 @@ class CacheItem:
         self.checksum = None
         self.created = time.time()
         self.time_field = None
+        self.compressed = False
         self.lock = threading.Lock()
 
 
 class Data(threading.Thread):
-    __chunk_size = 65536
+    __pipeline_buffers = 4
 
-    def __init__(self, st_path: str, data_api_url: str, max_age: int):
+    def __init__(self, st_path: str, data_api_url: str, max_age: int, compressed_cache: bool = False, buffer_size: int = 65536, pipelined: bool = False):
         super().__init__(name="data-handler", daemon=True)
         self.__st_path = st_path
         self.__data_api_url = data_api_url
         self.__max_age = max_age
+        self.__compressed_cache = compressed_cache
+        self.__buffer_size = buffer_size
+        self.__pipelined = pipelined
+        self.__local = threading.local()
         self.__cache: typing.Dict[str, CacheItem] = dict()
         self.__lock = threading.Lock()
+        metrics.cache_bytes.set_function(self.__cache_size)
+
+    def __cache_size(self) -> int:
+        size = 0
+        for file in os.listdir(self.__st_path):
+            try:
+                size += os.path.getsize(os.path.join(self.__st_path, file))
+            except OSError:
+                pass
+        return size
 
     def get_metadata(self, source_id: str) -> models.MetaData:
         resp = requests.get(url="{}/{}".format(self.__data_api_url, urllib.parse.quote(source_id)))
@@ -60,40 +75,75 @@ class Data(threading.Thread):
             raise RuntimeError("no data available for '{}'".format(source_id))
         return metadata
 
+    def __get_pipeline(self) -> util.Pipeline:
+        if getattr(self.__local, "pipeline", None) is None:
+            self.__local.pipeline = util.Pipeline(buffer_size=self.__buffer_size, buffers=self.__pipeline_buffers)
+        return self.__local.pipeline
+
     def __get_chunk(self, source_id: str, file: str, checksum: hashlib.sha256, compressed: bool):
+        start = time.perf_counter()
+        size = 0
         with requests.get(url="{}/{}/files/{}".format(self.__data_api_url, urllib.parse.quote(source_id), file), stream=True) as resp:
             if not resp.ok:
                 raise RuntimeError(resp.status_code)
-            with open(os.path.join(self.__st_path, file), "wb") as file:
-                if compressed:
-                    file = util.Decompress(file)
-                buffer = resp.raw.read(self.__chunk_size)
-                checksum.update(buffer)
-                while buffer:
-                    file.write(buffer)
-                    buffer = resp.raw.read(self.__chunk_size)
-                    checksum.update(buffer)
-                file.flush()
+            # chunks are written to a temporary file, an aborted download leaves no partial chunk behind
+            path = os.path.join(self.__st_path, file)
+            tmp_path = "{}.part".format(path)
+            try:
+                with open(tmp_path, "wb") as file:
+                    if compressed and not self.__compressed_cache:
+                        file = util.Decompress(file)
+                    if self.__pipelined:
+                        size = self.__get_pipeline().run(readinto=resp.raw.readinto, stages=(checksum.update, file.write))
+                    else:
+                        buffer = resp.raw.read(self.__buffer_size)
+                        checksum.update(buffer)
+                        while buffer:
+                            file.write(buffer)
+                            size += len(buffer)
+                            buffer = resp.raw.read(self.__buffer_size)
+                            checksum.update(buffer)
+                    file.flush()
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        metrics.download_bytes.inc(size)
+        metrics.download_duration.observe(time.perf_counter() - start)
 
     def __get_data(self, source_id: str, files: list, compressed: bool):
         checksum = hashlib.sha256()
         retries = 0
         chunk_count = 0
-        for file in files:
-            chunk_count += 1
-            logger.debug("retrieving chunk {}/{} for '{}' ...".format(chunk_count, len(files), source_id))
-            try:
-                self.__get_chunk(source_id=source_id, file=file, checksum=checksum, compressed=compressed)
-            except Exception as ex:
-                if retries >= 5:
-                    logger.error("retrieving chunk {}/{} for '{}' failed - {}".format(chunk_count, len(files), source_id, ex))
-                    raise ex
-                retries += 1
+        try:
+            for file in files:
+                chunk_count += 1
+                logger.debug("retrieving chunk {}/{} for '{}' ...".format(chunk_count, len(files), source_id))
+                try:
+                    self.__get_chunk(source_id=source_id, file=file, checksum=checksum, compressed=compressed)
+                except Exception as ex:
+                    if retries >= 5:
+                        logger.error("retrieving chunk {}/{} for '{}' failed - {}".format(chunk_count, len(files), source_id, ex))
+                        raise ex
+                    retries += 1
+        except BaseException:
+            # chunks of an incomplete download are not referenced by the cache
+            for file in files[:chunk_count]:
+                try:
+                    os.remove(os.path.join(self.__st_path, file))
+                except OSError:
+                    pass
+            raise
         return checksum.hexdigest()
 
-    def __get_new(self, source_id: str):
-        metadata = self.get_metadata(source_id)
-        checksum = self.__get_data(source_id, metadata.files, metadata.compressed)
+    def __get_new(self, source_id: str, spans: util.Spans):
+        with spans.span("metadata"):
+            metadata = self.get_metadata(source_id)
+        with spans.span("download"):
+            checksum = self.__get_data(source_id, metadata.files, metadata.compressed)
         retries = 0
         while metadata.checksum != checksum:
             if retries > 3:
@@ -101,31 +151,44 @@ class Data(threading.Thread):
             logger.warning("checksum mismatch for '{}' - refreshing metadata".format(source_id))
             metadata = self.get_metadata(source_id)
             retries += 1
-        return metadata.files, metadata.checksum, metadata.time_field
-
-    def __refresh_cache_item(self, source_id: str, cache_item: CacheItem):
-        cache_item.files, cache_item.checksum, cache_item.time_field = self.__get_new(source_id=source_id)
-
-    def get(self, source_id: str) -> typing.Tuple[list, str, str]:
+        return metadata.files, metadata.checksum, metadata.time_field, bool(metadata.compressed and self.__compressed_cache)
+
+    def __refresh_cache_item(self, source_id: str, cache_item: CacheItem, spans: util.Spans):
+        try:
+            cache_item.files, cache_item.checksum, cache_item.time_field, cache_item.compressed = self.__get_new(source_id=source_id, spans=spans)
+        except BaseException:
+            if not all(os.path.exists(os.path.join(self.__st_path, file)) for file in cache_item.files):
+                cache_item.files = list()
+            raise
+
+    def get(self, source_id: str, spans: typing.Optional[util.Spans] = None) -> typing.Tuple[list, str, str, bool]:
+        spans = spans or util.Spans()
         with self.__lock:
             if source_id not in self.__cache:
                 self.__cache[source_id] = CacheItem()
         cache_item = self.__cache[source_id]
         with cache_item.lock:
             if not cache_item.files:
-                self.__refresh_cache_item(source_id, cache_item)
+                metrics.cache_requests.inc(result="miss")
+                self.__refresh_cache_item(source_id, cache_item, spans)
             elif time.time() - cache_item.created > self.__max_age:
-                metadata = self.get_metadata(source_id)
+                with spans.span("metadata"):
+                    metadata = self.get_metadata(source_id)
                 if metadata.checksum != cache_item.checksum:
+                    metrics.cache_requests.inc(result="refresh")
                     old_files = cache_item.files
-                    self.__refresh_cache_item(source_id, cache_item)
+                    self.__refresh_cache_item(source_id, cache_item, spans)
                     for old_file in old_files:
                         try:
                             os.remove(os.path.join(self.__st_path, old_file))
                         except Exception as ex:
                             logger.warning("could not remove stale data - {}".format(ex))
+                else:
+                    metrics.cache_requests.inc(result="hit")
                 cache_item.created = time.time()
-            return [os.path.join(self.__st_path, file) for file in cache_item.files], cache_item.time_field, cache_item.checksum
+            else:
+                metrics.cache_requests.inc(result="hit")
+            return [os.path.join(self.__st_path, file) for file in cache_item.files], cache_item.time_field, cache_item.checksum, cache_item.compressed
 
     def run(self) -> None:
         stale_items = list()
@@ -18,8 +18,10 @@ __all__ = ("DB",)
 
 
 from ..logger import getLogger
+from .. import metrics
 import plyvel
 import threading
+import time
 
 logger = getLogger(__name__.split(".", 1)[-1])
 
@@ -30,28 +32,40 @@ class DB:
         self.__lock = threading.Lock()
 
     def put(self, db: bytes, key: bytes, value: bytes):
+        start = time.perf_counter()
         with self.__lock:
             partition = self.__kvs.prefixed_db(db)
             partition.put(key, value)
+        metrics.db_duration.observe(time.perf_counter() - start, operation="put")
 
     def get(self, db: bytes, key: bytes) -> bytes:
-        with self.__lock:
-            partition = self.__kvs.prefixed_db(db)
-            value = partition.get(key)
-            if not value:
-                raise KeyError(key)
-            return value
+        start = time.perf_counter()
+        try:
+            with self.__lock:
+                partition = self.__kvs.prefixed_db(db)
+                value = partition.get(key)
+                if not value:
+                    raise KeyError(key)
+                return value
+        finally:
+            metrics.db_duration.observe(time.perf_counter() - start, operation="get")
 
     def delete(self, db: bytes, key: bytes):
+        start = time.perf_counter()
         with self.__lock:
             partition = self.__kvs.prefixed_db(db)
             partition.delete(key)
+        metrics.db_duration.observe(time.perf_counter() - start, operation="delete")
 
     def list_keys(self, db: bytes) -> list:
-        with self.__lock:
-            partition = self.__kvs.prefixed_db(db)
-            with partition.iterator() as it:
-                return [key.decode() for key, _ in it]
+        start = time.perf_counter()
+        try:
+            with self.__lock:
+                partition = self.__kvs.prefixed_db(db)
+                with partition.iterator() as it:
+                    return [key.decode() for key, _ in it]
+        finally:
+            metrics.db_duration.observe(time.perf_counter() - start, operation="list_keys")
 
     def close(self):
         with self.__lock:
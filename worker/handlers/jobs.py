@@ -19,7 +19,10 @@ __all__ = ("Jobs",)
 
 from ..logger import getLogger
 from .. import weibull
+from .. import series
 from .. import models
+from .. import util
+from .. import metrics
 from . import DB, Data
 import threading
 import queue
@@ -31,6 +34,9 @@ import time
 import multiprocessing
 import signal
 import sys
+import os
+import collections
+import cProfile
 
 
 logger = getLogger(__name__.split(".", 1)[-1])
@@ -41,10 +47,20 @@ def handle_sigterm(signo, stack_frame):
     sys.exit(0)
 
 
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as ex:
+        logger.warning("could not remove '{}' - {}".format(path, ex))
+
+
 # temporary workaround for code not supporting chunked data --->
 class ConcatenatedFile:
-    def __init__(self, files):
+    def __init__(self, files, compressed=False):
         self.__chunks = files
+        self.__compressed = compressed
 
     def __read(self, n=65536):
         for chunk in self.__chunks:
@@ -56,10 +72,15 @@ class ConcatenatedFile:
             file.close()
 
     def build_input(self):
-        path = "/data_cache/{}".format(uuid.uuid4().hex)
-        with open(path, "wb") as file:
-            for buffer in self.__read():
-                file.write(buffer)
+        # gzip members can be concatenated, the suffix lets the csv reader decompress while parsing
+        path = os.path.join(os.path.dirname(self.__chunks[0]), "{}{}".format(uuid.uuid4().hex, ".gz" if self.__compressed else ""))
+        try:
+            with open(path, "wb") as file:
+                for buffer in self.__read():
+                    file.write(buffer)
+        except BaseException:
+            remove_file(path)
+            raise
         return path
 # <-------------------------------------------------------------
 
@@ -69,40 +90,152 @@ class Result:
         self.weibull_item: typing.Optional[models.Weibull] = None
         self.job: typing.Optional[models.Job] = None
         self.error = False
+        self.peak_rss = None
+        self.metrics = None
+
+
+class ServiceStats:
+    def __init__(self):
+        self.peak_rss = None
+
+
+class JobQueue:
+    def __init__(self):
+        self.__classes: typing.Dict[int, typing.OrderedDict[str, typing.Deque[str]]] = dict()
+        self.__entries: typing.Dict[str, int] = dict()
+        self.__cond = threading.Condition()
+
+    def put(self, job_id: str, service_id: str, priority: int):
+        with self.__cond:
+            self.__entries[job_id] = priority
+            if priority not in self.__classes:
+                self.__classes[priority] = collections.OrderedDict()
+            services = self.__classes[priority]
+            if service_id not in services:
+                services[service_id] = collections.deque()
+            services[service_id].append(job_id)
+            self.__cond.notify()
+
+    def put_back(self, job_id: str, service_id: str, priority: int):
+        # job keeps its place at the head of its class
+        with self.__cond:
+            self.__entries[job_id] = priority
+            if priority not in self.__classes:
+                self.__classes[priority] = collections.OrderedDict()
+            services = self.__classes[priority]
+            if service_id not in services:
+                services[service_id] = collections.deque()
+            services[service_id].appendleft(job_id)
+            services.move_to_end(service_id, last=False)
+            self.__cond.notify()
+
+    def promote(self, job_id: str, service_id: str, priority: int) -> bool:
+        with self.__cond:
+            if job_id in self.__entries and priority < self.__entries[job_id]:
+                # entry in previous class becomes stale and is skipped by get
+                self.put(job_id=job_id, service_id=service_id, priority=priority)
+                return True
+            return False
+
+    def get(self, timeout: typing.Union[int, float]) -> str:
+        deadline = time.monotonic() + timeout
+        with self.__cond:
+            while True:
+                for priority in sorted(self.__classes.keys()):
+                    services = self.__classes[priority]
+                    while services:
+                        service_id, jobs = next(iter(services.items()))
+                        job_id = jobs.popleft()
+                        if jobs:
+                            services.move_to_end(service_id)
+                        else:
+                            del services[service_id]
+                        if self.__entries.get(job_id) == priority:
+                            del self.__entries[job_id]
+                            return job_id
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise queue.Empty
+                self.__cond.wait(remaining)
+
+    def qsize(self) -> int:
+        with self.__cond:
+            return len(self.__entries)
 
 
 class Worker(multiprocessing.Process):
-    def __init__(self, job: models.Job, weibull_item: models.Weibull, data_handler: Data):
+    def __init__(self, job: models.Job, weibull_item: models.Weibull, data_handler: Data, mem_estimate: int, profile_path: typing.Optional[str] = None):
         super().__init__(name="jobs-worker-{}".format(job.id), daemon=True)
         self.__weibull_item = weibull_item
         self.__data_handler = data_handler
         self.__job = job
+        self.__profile_path = profile_path
+        self.service_id = weibull_item.service_id
+        self.mem_estimate = mem_estimate
+        self.peak_rss = 0
+        self.started = None
         self.result = multiprocessing.Queue()
+        self.result_obj: typing.Optional[Result] = None
 
     def run(self) -> None:
         signal.signal(signal.SIGTERM, handle_sigterm)
         signal.signal(signal.SIGINT, handle_sigterm)
+        metrics.registry.reset()
         result_obj = Result()
+        spans = util.Spans(process_resources=True)
+        input_path = None
+        profiler = None
+        if self.__profile_path:
+            profiler = cProfile.Profile()
+            profiler.enable()
         try:
             logger.debug("starting job '{}' ...".format(self.__job.id))
             self.__job.status = models.JobStatus.running
-            files, time_field, self.__weibull_item.data_checksum = self.__data_handler.get(source_id=self.__weibull_item.service_id)
-            input_path = ConcatenatedFile(files=files).build_input()
-            logger.debug(
-                "{}: calculating weibull distribution for '{}' in '{}' ...".format(
-                    self.__job.id, self.__weibull_item.config["target_error_code"],
-                    self.__weibull_item.config["target_col"]
-                )
-            )
-            self.__weibull_item.result = weibull.generate_weibull(
-                df=weibull.df_from_csv(
+            files, time_field, self.__weibull_item.data_checksum, compressed = self.__data_handler.get(source_id=self.__weibull_item.service_id, spans=spans)
+            with spans.span("build_input"):
+                input_path = ConcatenatedFile(files=files, compressed=compressed).build_input()
+            with spans.span("parse"):
+                df = weibull.df_from_csv(
                     csv_path=input_path,
                     time_col=time_field,
                     sorted=True
-                ),
-                errorcode_column=self.__weibull_item.config["target_col"],
-                errorcode=self.__weibull_item.config["target_error_code"]
-            )
+                )
+            config = self.__weibull_item.config
+            if "target_error_code" in config:
+                logger.debug(
+                    "{}: calculating weibull distribution for '{}' in '{}' ...".format(
+                        self.__job.id, config["target_error_code"], config["target_col"]
+                    )
+                )
+                with spans.span("fit"):
+                    self.__weibull_item.result = weibull.generate_weibull(
+                        df=df,
+                        errorcode_column=config["target_col"],
+                        errorcode=config["target_error_code"]
+                    )
+                if config.get("windows"):
+                    with spans.span("windows"):
+                        try:
+                            self.__weibull_item.series = series.fit_windows(
+                                df=df,
+                                time_col=time_field,
+                                errorcode_column=config["target_col"],
+                                errorcode=config["target_error_code"],
+                                windows=config["windows"]
+                            )
+                        except Exception as ex:
+                            logger.warning("{}: calculating windows failed - {}".format(self.__job.id, ex))
+                            self.__weibull_item.series = dict(error=str(ex))
+            else:
+                logger.debug("{}: calculating weibull distributions for all codes in '{}' ...".format(self.__job.id, config["target_col"]))
+                with spans.span("fit"):
+                    self.__weibull_item.result = series.fit_codes(
+                        df=df,
+                        time_col=time_field,
+                        errorcode_column=config["target_col"],
+                        min_events=config.get("min_events", 3),
+                        exclude_codes=config.get("exclude_codes", series.no_error_codes)
+                    )
             self.__weibull_item.created = "{}Z".format(datetime.datetime.utcnow().isoformat())
             result_obj.weibull_item = self.__weibull_item
             self.__job.status = models.JobStatus.finished
@@ -112,35 +245,117 @@ class Worker(multiprocessing.Process):
             self.__job.reason = str(ex)
             logger.error("{}: failed - {}".format(self.__job.id, ex))
             result_obj.error = True
+        finally:
+            if input_path:
+                remove_file(input_path)
+            if profiler:
+                profiler.disable()
+                try:
+                    profiler.dump_stats(self.__profile_path)
+                except Exception as ex:
+                    logger.warning("{}: writing profile failed - {}".format(self.__job.id, ex))
+            self.__job.stages = spans.stages
         result_obj.job = self.__job
+        result_obj.peak_rss = max(spans.peak_rss, util.get_peak_rss())
+        result_obj.metrics = metrics.registry.export()
         self.result.put(result_obj)
 
 
 class Jobs(threading.Thread):
-    def __init__(self, db_handler: DB, data_handler: Data, check_delay: typing.Union[int, float], max_jobs: int):
+    __default_mem_estimate = 536870912
+    __kill_timeout = 5
+    __max_interruptions = 3
+
+    def __init__(self, db_handler: DB, data_handler: Data, check_delay: typing.Union[int, float], max_jobs: int, max_cores: int = 0, max_mem: int = 0, job_mem_limit: int = 0, timeout: int = 0, profile_path: typing.Optional[str] = None, profile_services: typing.Sequence[str] = ()):
         super().__init__(name="jobs-handler", daemon=True)
         self.__db_handler = db_handler
         self.__data_handler = data_handler
         self.__check_delay = check_delay
         self.__max_jobs = max_jobs
-        self.__job_queue = queue.Queue()
+        self.__max_cores = max_cores
+        self.__max_mem = max_mem * 1048576
+        self.__job_mem_limit = job_mem_limit * 1048576
+        self.__timeout = timeout
+        self.__profile_path = profile_path
+        self.__profile_services = set(profile_services)
+        self.__job_queue = JobQueue()
         self.__job_pool: typing.Dict[str, models.Job] = dict()
+        self.__weibull_jobs: typing.Dict[str, str] = dict()
+        self.__lock = threading.Lock()
         self.__worker_pool: typing.Dict[str, Worker] = dict()
+        self.__service_stats: typing.Dict[str, ServiceStats] = dict()
+        metrics.jobs_queued.set_function(self.__job_queue.qsize)
+        metrics.jobs_running.set_function(lambda: len(self.__worker_pool))
 
-    def create(self, weibull_id: str) -> str:
-        for job in self.__job_pool.values():
-            if job.weibull_id == weibull_id:
-                logger.debug("job for weibull ID '{}' already exists".format(weibull_id))
+    def create(self, weibull_id: str, timeout: typing.Optional[typing.Union[int, float]] = None, priority: int = models.JobPriority.interactive, profile: bool = False) -> str:
+        if timeout is not None and not util.is_timeout(timeout):
+            raise ValueError("timeout must be a positive number")
+        service_id = json.loads(self.__db_handler.get(b"weibull-", weibull_id.encode()))["service_id"]
+        with self.__lock:
+            job_id = self.__weibull_jobs.get(weibull_id)
+            if job_id and self.__job_pool[job_id].status != models.JobStatus.aborted:
+                job = self.__job_pool[job_id]
+                if job.status == models.JobStatus.pending and self.__job_queue.promote(job_id=job.id, service_id=service_id, priority=priority):
+                    job.priority = priority
+                    self.__persist_job(job)
+                    logger.debug("job for weibull ID '{}' already exists - raised priority to '{}'".format(weibull_id, priority))
+                else:
+                    logger.debug("job for weibull ID '{}' already exists".format(weibull_id))
                 return job.id
-        job = models.Job(
-            id=uuid.uuid4().hex,
-            weibull_id=weibull_id,
-            created="{}Z".format(datetime.datetime.utcnow().isoformat())
-        )
+            job = models.Job(
+                id=uuid.uuid4().hex,
+                weibull_id=weibull_id,
+                created="{}Z".format(datetime.datetime.utcnow().isoformat()),
+                timeout=timeout,
+                priority=priority,
+                profile=profile
+            )
+            self.__enqueue_job(job, service_id)
+            logger.debug("created job for weibull ID '{}'".format(weibull_id))
+            return job.id
+
+    def recover(self):
+        jobs = [models.Job(json.loads(self.__db_handler.get(b"queue-", job_id.encode()))) for job_id in self.__db_handler.list_keys(b"queue-")]
+        jobs.sort(key=lambda job: (job.priority, job.created))
+        for job in jobs:
+            try:
+                if job.status == models.JobStatus.aborted:
+                    self.__db_handler.put(b"jobs-", job.id.encode(), json.dumps(dict(job)).encode())
+                    self.__db_handler.delete(b"queue-", job.id.encode())
+                    continue
+                if job.timeout is not None and not util.is_timeout(job.timeout):
+                    logger.warning("{}: invalid timeout '{}' - using default".format(job.id, job.timeout))
+                    job.timeout = None
+                if job.status == models.JobStatus.running:
+                    job.status = models.JobStatus.pending
+                    job.interrupted += 1
+                    if job.interrupted >= self.__max_interruptions:
+                        job.status = models.JobStatus.failed
+                        job.reason = "run was interrupted {} times".format(job.interrupted)
+                        logger.error("{}: {} - not restarting".format(job.id, job.reason))
+                        self.__db_handler.put(b"jobs-", job.id.encode(), json.dumps(dict(job)).encode())
+                        self.__db_handler.delete(b"queue-", job.id.encode())
+                        continue
+                    logger.warning("{}: run was interrupted - restarting".format(job.id))
+                service_id = json.loads(self.__db_handler.get(b"weibull-", job.weibull_id.encode()))["service_id"]
+                with self.__lock:
+                    self.__enqueue_job(job, service_id)
+                logger.debug("{}: recovered".format(job.id))
+            except Exception as ex:
+                job.status = models.JobStatus.failed
+                job.reason = "recovery failed - {}".format(ex)
+                logger.error("{}: {}".format(job.id, job.reason))
+                self.__db_handler.put(b"jobs-", job.id.encode(), json.dumps(dict(job)).encode())
+                self.__db_handler.delete(b"queue-", job.id.encode())
+
+    def __persist_job(self, job: models.Job):
+        self.__db_handler.put(b"queue-", job.id.encode(), json.dumps(dict(job)).encode())
+
+    def __enqueue_job(self, job: models.Job, service_id: str):
+        self.__persist_job(job)
         self.__job_pool[job.id] = job
-        logger.debug("created job for weibull ID '{}'".format(weibull_id))
-        self.__job_queue.put_nowait(job.id)
-        return job.id
+        self.__weibull_jobs[job.weibull_id] = job.id
+        self.__job_queue.put(job_id=job.id, service_id=service_id, priority=job.priority)
 
     def get_job(self, job_id: str) -> models.Job:
         return self.__job_pool[job_id]
@@ -148,34 +363,163 @@ class Jobs(threading.Thread):
     def list_jobs(self) -> list:
         return list(self.__job_pool.keys())
 
+    def cancel(self, job_id: str):
+        # jobs are removed from the pool under the lock, a completed job is never persisted again
+        with self.__lock:
+            job = self.__job_pool[job_id]
+            if job.status in (models.JobStatus.pending, models.JobStatus.running):
+                job.status = models.JobStatus.aborted
+                job.reason = "canceled"
+                self.__persist_job(job)
+                logger.debug("{}: canceled".format(job_id))
+
+    def __estimate_mem(self, service_id: str) -> int:
+        stats = self.__service_stats.get(service_id)
+        if stats and stats.peak_rss:
+            return stats.peak_rss
+        return self.__default_mem_estimate
+
+    def __admissible(self, mem_estimate: int) -> bool:
+        if not self.__worker_pool:
+            return True
+        if len(self.__worker_pool) >= self.__max_jobs:
+            return False
+        if self.__max_cores and len(self.__worker_pool) >= self.__max_cores:
+            return False
+        if self.__max_mem:
+            mem_used = sum(max(worker.mem_estimate, worker.peak_rss) for worker in self.__worker_pool.values())
+            return mem_used + mem_estimate <= self.__max_mem
+        return True
+
+    def __remove_job(self, job_id: str):
+        with self.__lock:
+            job = self.__job_pool.pop(job_id)
+            if self.__weibull_jobs.get(job.weibull_id) == job_id:
+                del self.__weibull_jobs[job.weibull_id]
+            self.__db_handler.delete(b"queue-", job_id.encode())
+
+    def __discard_job(self, job_id: str):
+        job = self.__job_pool[job_id]
+        self.__db_handler.put(b"jobs-", job.id.encode(), json.dumps(dict(job)).encode())
+        self.__remove_job(job_id)
+
+    def __stop_worker(self, worker: Worker):
+        worker.terminate()
+        worker.join(self.__kill_timeout)
+        if worker.is_alive():
+            logger.warning("{}: did not exit - killing ...".format(worker.name))
+            worker.kill()
+            worker.join()
+
+    def __start_job(self, job_id: str, weibull_item: models.Weibull) -> bool:
+        mem_estimate = self.__estimate_mem(weibull_item.service_id)
+        if not self.__admissible(mem_estimate):
+            # job waits in the queue so that jobs of higher priority can overtake it
+            self.__job_queue.put_back(job_id=job_id, service_id=weibull_item.service_id, priority=self.__job_pool[job_id].priority)
+            return False
+        with self.__lock:
+            job = self.__job_pool[job_id]
+            canceled = job.status == models.JobStatus.aborted
+            if not canceled:
+                job.status = models.JobStatus.running
+                self.__persist_job(job)
+        if canceled:
+            self.__discard_job(job_id)
+            return True
+        profile_path = None
+        if self.__profile_path and (job.profile or weibull_item.service_id in self.__profile_services or "*" in self.__profile_services):
+            profile_path = os.path.join(self.__profile_path, "{}.prof".format(job_id))
+        worker = Worker(
+            job=job,
+            weibull_item=weibull_item,
+            data_handler=self.__data_handler,
+            mem_estimate=mem_estimate,
+            profile_path=profile_path
+        )
+        self.__worker_pool[job_id] = worker
+        worker.started = time.time()
+        worker.start()
+        return True
+
+    def __update_service_stats(self, service_id: str, peak_rss: int):
+        if service_id not in self.__service_stats:
+            self.__service_stats[service_id] = ServiceStats()
+        stats = self.__service_stats[service_id]
+        if peak_rss:
+            stats.peak_rss = peak_rss
+
+    def __check_workers(self):
+        for job_id in list(self.__worker_pool.keys()):
+            worker = self.__worker_pool[job_id]
+            job = self.__job_pool[job_id]
+            if worker.result_obj is None:
+                # read result while worker is alive, a worker can't exit before its result is consumed
+                try:
+                    worker.result_obj = worker.result.get_nowait()
+                except queue.Empty:
+                    pass
+            if worker.is_alive() and worker.result_obj is None:
+                rss = util.get_rss(worker.pid)
+                worker.peak_rss = max(worker.peak_rss, rss)
+                timeout = job.timeout or self.__timeout
+                if job.status != models.JobStatus.aborted:
+                    if self.__job_mem_limit and rss > self.__job_mem_limit:
+                        job.status = models.JobStatus.aborted
+                        job.reason = "exceeded memory limit ({} MB > {} MB)".format(rss // 1048576, self.__job_mem_limit // 1048576)
+                    elif timeout and time.time() - worker.started > timeout:
+                        job.status = models.JobStatus.aborted
+                        job.reason = "exceeded timeout ({} s)".format(timeout)
+                if job.status == models.JobStatus.aborted:
+                    logger.warning("{}: aborting - {}".format(job_id, job.reason))
+                    self.__stop_worker(worker)
+            if worker.result_obj is not None or not worker.is_alive():
+                worker.join(self.__kill_timeout)
+                if worker.is_alive():
+                    self.__stop_worker(worker)
+                status = job.status
+                if job.status == models.JobStatus.aborted:
+                    self.__db_handler.put(b"jobs-", job.id.encode(), json.dumps(dict(job)).encode())
+                else:
+                    try:
+                        res = worker.result_obj or worker.result.get(timeout=5)
+                        status = res.job.status
+                        metrics.registry.merge(res.metrics)
+                        worker.peak_rss = max(worker.peak_rss, res.peak_rss)
+                        if not res.error:
+                            spans = util.Spans()
+                            with spans.span("db_write"):
+                                self.__db_handler.put(b"weibull-", res.weibull_item.id.encode(), json.dumps(dict(res.weibull_item)).encode())
+                            res.job.stages.update(spans.stages)
+                        self.__db_handler.put(b"jobs-", res.job.id.encode(), json.dumps(dict(res.job)).encode())
+                        for stage, span in res.job.stages.items():
+                            metrics.job_duration.observe(span["wall_time"], stage=stage)
+                    except queue.Empty:
+                        status = models.JobStatus.failed
+                        logger.error("job '{}' quit with exitcode '{}'".format(job_id, worker.exitcode))
+                metrics.jobs_total.inc(status=status)
+                metrics.job_duration.observe(time.time() - worker.started, stage="total")
+                self.__update_service_stats(worker.service_id, worker.peak_rss)
+                worker.close()
+                del self.__worker_pool[job_id]
+                self.__remove_job(job_id)
+
     def run(self):
         while True:
             try:
-                if len(self.__worker_pool) < self.__max_jobs:
+                try:
+                    job_id = self.__job_queue.get(timeout=self.__check_delay)
+                    if self.__job_pool[job_id].status == models.JobStatus.aborted:
+                        self.__discard_job(job_id)
+                        continue
                     try:
-                        job_id = self.__job_queue.get(timeout=self.__check_delay)
-                        worker = Worker(
-                            job=self.__job_pool[job_id],
-                            weibull_item=models.Weibull(json.loads(self.__db_handler.get(b"weibull-", self.__job_pool[job_id].weibull_id.encode()))),
-                            data_handler=self.__data_handler
-                        )
-                        self.__worker_pool[job_id] = worker
-                        worker.start()
-                    except queue.Empty:
-                        pass
-                else:
-                    time.sleep(self.__check_delay)
-                for job_id in list(self.__worker_pool.keys()):
-                    if not self.__worker_pool[job_id].is_alive():
-                        try:
-                            res = self.__worker_pool[job_id].result.get(timeout=5)
-                            self.__db_handler.put(b"jobs-", res.job.id.encode(), json.dumps(dict(res.job)).encode())
-                            if not res.error:
-                                self.__db_handler.put(b"weibull-", res.weibull_item.id.encode(), json.dumps(dict(res.weibull_item)).encode())
-                        except queue.Empty:
-                            logger.error("job '{}' quit with exitcode '{}'".format(job_id, self.__worker_pool[job_id].exitcode))
-                        self.__worker_pool[job_id].close()
-                        del self.__worker_pool[job_id]
-                        del self.__job_pool[job_id]
+                        weibull_item = models.Weibull(json.loads(self.__db_handler.get(b"weibull-", self.__job_pool[job_id].weibull_id.encode())))
+                    except Exception:
+                        self.__remove_job(job_id)
+                        raise
+                    if not self.__start_job(job_id, weibull_item):
+                        time.sleep(self.__check_delay)
+                except queue.Empty:
+                    pass
+                self.__check_workers()
             except Exception as ex:
                 logger.error("job handling failed - {}".format(ex))
@@ -19,6 +19,7 @@ __all__ = ("Scheduler",)
 
 from ..logger import getLogger
 from .. import models
+from .. import metrics
 from . import DB, Jobs, Data
 import threading
 import time
@@ -41,13 +42,16 @@ class Scheduler(threading.Thread):
             try:
                 time.sleep(self.__delay)
                 logger.debug("scheduling jobs ...")
+                start = time.perf_counter()
                 for weibull_id in self.__db_handler.list_keys(b"weibull-"):
                     try:
                         weibull = models.Weibull(json.loads(self.__db_handler.get(b"weibull-", weibull_id.encode())))
                         meta_data = self.__data_handler.get_metadata(weibull.service_id)
                         if meta_data.checksum != weibull.data_checksum:
-                            self.__job_handler.create(weibull_id=weibull_id)
+                            self.__job_handler.create(weibull_id=weibull_id, priority=models.JobPriority.scheduled)
+                            metrics.scheduler_jobs_total.inc()
                     except Exception as ex:
                         logger.error("scheduling job for weibull '{}' failed - {}".format(weibull_id, ex))
+                metrics.scheduler_pass_duration.observe(time.perf_counter() - start)
             except Exception as ex:
                 logger.error("scheduling jobs failed - {}".format(ex))
@@ -0,0 +1,207 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("Server", "DBClient", "JobsClient", "MetricsClient", "MetricsPusher")
+
+
+from .logger import getLogger
+from . import handlers
+from . import models
+from . import metrics
+import multiprocessing.connection
+import threading
+import typing
+import time
+import os
+
+
+logger = getLogger(__name__.split(".", 1)[-1])
+
+
+class RemoteError(Exception):
+    pass
+
+
+class Server(threading.Thread):
+    def __init__(self, socket_path: str, authkey: bytes, db_handler: handlers.DB, jobs_handler: handlers.Jobs):
+        super().__init__(name="ipc-server", daemon=True)
+        if not authkey:
+            raise ValueError("authkey required")
+        self.__socket_path = socket_path
+        self.__authkey = authkey
+        self.__targets = {
+            "db": (db_handler, ("get", "put", "delete", "list_keys")),
+            "jobs": (jobs_handler, ("create", "get_job", "list_jobs", "cancel")),
+            "metrics": (metrics.registry, ("render", "merge"))
+        }
+
+    def __call(self, target: str, method: str, args: tuple, kwargs: dict):
+        obj, methods = self.__targets[target]
+        if method not in methods:
+            raise RemoteError("unknown method '{}.{}'".format(target, method))
+        result = getattr(obj, method)(*args, **kwargs)
+        if isinstance(result, models.Job):
+            return dict(result)
+        return result
+
+    def __handle(self, conn: multiprocessing.connection.Connection):
+        with conn:
+            while True:
+                try:
+                    target, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    conn.send(("ok", self.__call(target, method, args, kwargs)))
+                except KeyError as ex:
+                    conn.send(("key_error", ex.args))
+                except Exception as ex:
+                    logger.error("{}.{} failed - {}".format(target, method, ex))
+                    conn.send(("error", str(ex)))
+
+    def run(self) -> None:
+        os.makedirs(os.path.dirname(self.__socket_path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(self.__socket_path):
+            os.remove(self.__socket_path)
+        with multiprocessing.connection.Listener(address=self.__socket_path, family="AF_UNIX", authkey=self.__authkey) as listener:
+            os.chmod(self.__socket_path, 0o600)
+            logger.info("listening on '{}'".format(self.__socket_path))
+            while True:
+                try:
+                    conn = listener.accept()
+                    threading.Thread(target=self.__handle, args=(conn,), daemon=True).start()
+                except Exception as ex:
+                    logger.error("accepting connection failed - {}".format(ex))
+
+
+class Client:
+    def __init__(self, socket_path: str, authkey: bytes, target: str):
+        if not authkey:
+            raise ValueError("authkey required")
+        self.__socket_path = socket_path
+        self.__authkey = authkey
+        self.__target = target
+        self.__local = threading.local()
+
+    def __close(self):
+        conn = getattr(self.__local, "conn", None)
+        self.__local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def __connection(self) -> multiprocessing.connection.Connection:
+        conn = getattr(self.__local, "conn", None)
+        if conn is not None:
+            # no data is pending between calls, a readable connection was closed by the engine
+            try:
+                stale = conn.poll()
+            except (EOFError, OSError):
+                stale = True
+            if stale:
+                self.__close()
+        if getattr(self.__local, "conn", None) is None:
+            self.__local.conn = multiprocessing.connection.Client(address=self.__socket_path, family="AF_UNIX", authkey=self.__authkey)
+        return self.__local.conn
+
+    def _call(self, method: str, *args, **kwargs):
+        request = (self.__target, method, args, kwargs)
+        try:
+            conn = self.__connection()
+            conn.send(request)
+        except (EOFError, OSError):
+            # request was not delivered and can be sent again
+            self.__close()
+            conn = self.__connection()
+            conn.send(request)
+        try:
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            # request might have been executed by the engine, not safe to repeat
+            self.__close()
+            raise
+        if status == "key_error":
+            raise KeyError(*result)
+        if status == "error":
+            raise RemoteError(result)
+        return result
+
+
+class DBClient(Client):
+    def __init__(self, socket_path: str, authkey: bytes):
+        super().__init__(socket_path=socket_path, authkey=authkey, target="db")
+
+    def put(self, db: bytes, key: bytes, value: bytes):
+        self._call("put", db, key, value)
+
+    def get(self, db: bytes, key: bytes) -> bytes:
+        return self._call("get", db, key)
+
+    def delete(self, db: bytes, key: bytes):
+        self._call("delete", db, key)
+
+    def list_keys(self, db: bytes) -> list:
+        return self._call("list_keys", db)
+
+
+class JobsClient(Client):
+    def __init__(self, socket_path: str, authkey: bytes):
+        super().__init__(socket_path=socket_path, authkey=authkey, target="jobs")
+
+    def create(self, weibull_id: str, timeout: typing.Optional[typing.Union[int, float]] = None, priority: int = models.JobPriority.interactive, profile: bool = False) -> str:
+        return self._call("create", weibull_id=weibull_id, timeout=timeout, priority=priority, profile=profile)
+
+    def get_job(self, job_id: str) -> models.Job:
+        return models.Job(self._call("get_job", job_id))
+
+    def list_jobs(self) -> list:
+        return self._call("list_jobs")
+
+    def cancel(self, job_id: str):
+        self._call("cancel", job_id)
+
+
+class MetricsClient(Client):
+    def __init__(self, socket_path: str, authkey: bytes):
+        super().__init__(socket_path=socket_path, authkey=authkey, target="metrics")
+
+    def push(self):
+        # http metrics are recorded by each api process and collected by the engine
+        values = metrics.http_duration.pop()
+        if values:
+            try:
+                self._call("merge", {metrics.http_duration.name: values})
+            except Exception:
+                metrics.http_duration.merge(values)
+                raise
+
+    def render(self) -> str:
+        self.push()
+        return self._call("render")
+
+
+class MetricsPusher(threading.Thread):
+    def __init__(self, metrics_client: MetricsClient, interval: typing.Union[int, float] = 5):
+        super().__init__(name="metrics-pusher", daemon=True)
+        self.__metrics_client = metrics_client
+        self.__interval = interval
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.__interval)
+            try:
+                self.__metrics_client.push()
+            except Exception as ex:
+                logger.error("pushing metrics failed - {}".format(ex))
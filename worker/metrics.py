@@ -0,0 +1,206 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("Counter", "Gauge", "Histogram", "Registry", "registry")
+
+
+import threading
+import bisect
+import typing
+import abc
+
+
+def format_labels(label_names: typing.Sequence[str], label_values: typing.Sequence[str], extra: str = "") -> str:
+    labels = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return "{{{}}}".format(",".join(labels)) if labels else ""
+
+
+class Metric(abc.ABC):
+    type = None
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: typing.Dict[tuple, typing.Any] = dict()
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def export(self) -> dict:
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def pop(self) -> dict:
+        with self._lock:
+            values = self._values
+            self._values = dict()
+        return values
+
+    @abc.abstractmethod
+    def merge(self, values: dict):
+        pass
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _copy(self, value):
+        return value
+
+    @abc.abstractmethod
+    def samples(self) -> typing.List[str]:
+        pass
+
+    def render(self) -> str:
+        lines = ["# HELP {} {}".format(self.name, self.description), "# TYPE {} {}".format(self.name, self.type)]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: typing.Union[int, float] = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> typing.List[str]:
+        with self._lock:
+            return ["{}{} {}".format(self.name, format_labels(self.label_names, key), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self.__function: typing.Optional[typing.Callable[[], typing.Union[int, float]]] = None
+
+    def set(self, value: typing.Union[int, float], **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: typing.Callable[[], typing.Union[int, float]]):
+        self.__function = function
+
+    def merge(self, values: dict):
+        pass
+
+    def samples(self) -> typing.List[str]:
+        if self.__function:
+            return ["{} {}".format(self.name, self.__function())]
+        with self._lock:
+            return ["{}{} {}".format(self.name, format_labels(self.label_names, key), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = (), buckets: typing.Sequence[float] = default_buckets):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: typing.Union[int, float], **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            state = self._values[key]
+            state[0][index] += 1
+            state[1] += value
+
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+
+    def merge(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                if key not in self._values:
+                    self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+                state = self._values[key]
+                for index, count in enumerate(value[0]):
+                    state[0][index] += count
+                state[1] += value[1]
+
+    def samples(self) -> typing.List[str]:
+        lines = list()
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            self.name,
+                            format_labels(self.label_names, key, 'le="{}"'.format("+Inf" if bound == float("inf") else bound)),
+                            cumulative
+                        )
+                    )
+                lines.append("{}_sum{} {}".format(self.name, format_labels(self.label_names, key), total))
+                lines.append("{}_count{} {}".format(self.name, format_labels(self.label_names, key), cumulative))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.__metrics: typing.Dict[str, Metric] = dict()
+
+    def register(self, metric: Metric) -> Metric:
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def export(self) -> dict:
+        return {name: metric.export() for name, metric in self.__metrics.items() if not isinstance(metric, Gauge)}
+
+    def merge(self, state: dict):
+        for name, values in state.items():
+            if name in self.__metrics:
+                self.__metrics[name].merge(values)
+
+    def reset(self):
+        for metric in self.__metrics.values():
+            metric.reset()
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.__metrics.values()) + "\n"
+
+
+registry = Registry()
+
+jobs_queued = registry.register(Gauge("weibull_jobs_queued", "Number of jobs waiting in the queue."))
+jobs_running = registry.register(Gauge("weibull_jobs_running", "Number of running job workers."))
+jobs_total = registry.register(Counter("weibull_jobs_total", "Number of completed jobs.", ("status",)))
+job_duration = registry.register(Histogram("weibull_job_duration_seconds", "Job duration by stage.", ("stage",)))
+cache_bytes = registry.register(Gauge("weibull_data_cache_bytes", "Size of the data cache directory."))
+cache_requests = registry.register(Counter("weibull_data_cache_requests_total", "Data cache lookups by result.", ("result",)))
+download_bytes = registry.register(Counter("weibull_data_download_bytes_total", "Bytes downloaded from the data service."))
+download_duration = registry.register(Histogram("weibull_data_chunk_download_seconds", "Duration of chunk downloads."))
+scheduler_pass_duration = registry.register(Histogram("weibull_scheduler_pass_duration_seconds", "Duration of scheduler passes."))
+scheduler_jobs_total = registry.register(Counter("weibull_scheduler_jobs_total", "Number of jobs created by the scheduler."))
+db_duration = registry.register(Histogram("weibull_db_operation_duration_seconds", "Duration of database operations.", ("operation",), buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)))
+http_duration = registry.register(Histogram("weibull_http_request_duration_seconds", "HTTP request latency.", ("method", "resource", "status")))
@@ -18,7 +18,7 @@
 import simple_struct
 
 
-__all__ = ("Job", "JobStatus", "Weibull", "WeibullRequest", "MetaData")
+__all__ = ("Job", "JobStatus", "JobPriority", "Weibull", "WeibullRequest", "MetaData")
 
 
 class JobStatus:
@@ -29,6 +29,12 @@ class JobStatus:
     aborted = "aborted"
 
 
+class JobPriority:
+    interactive = 0
+    new = 1
+    scheduled = 2
+
+
 @simple_struct.structure
 class Job:
     id = None
@@ -36,6 +42,11 @@ class Job:
     status = JobStatus.pending
     weibull_id = None
     reason = None
+    timeout = None
+    priority = JobPriority.interactive
+    profile = False
+    stages = None
+    interrupted = 0
 
 
 @simple_struct.structure
@@ -44,6 +55,7 @@ class Weibull:
     created = None
     config = None
     result = None
+    series = None
     service_id = None
     data_checksum = None
 
@@ -0,0 +1,184 @@
+"""
+   Copyright 2021 InfAI (CC SES)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__all__ = ("IntervalIndex", "fit_windows", "fit_codes")
+
+
+import numpy
+import pandas
+import datetime
+import typing
+
+
+max_iter = 50
+tolerance = 1e-9
+no_error_codes = (0,)
+
+
+def get_timestamps(df: pandas.DataFrame, time_col: str) -> numpy.ndarray:
+    times = df[time_col] if time_col in df.columns else df.index
+    return pandas.to_datetime(times).values.astype("datetime64[ns]").astype(numpy.int64) / 1e9
+
+
+def to_iso(timestamp: float) -> str:
+    return "{}Z".format(datetime.datetime.utcfromtimestamp(timestamp).isoformat())
+
+
+def solve_mle(log_x: numpy.ndarray, offsets: numpy.ndarray, shape: typing.Optional[numpy.ndarray] = None) -> typing.Tuple[numpy.ndarray, numpy.ndarray]:
+    # maximum likelihood estimation for groups of log intervals stored contiguously at offsets,
+    # each group requires at least two intervals with positive variance
+    counts = numpy.diff(numpy.append(offsets, len(log_x)))
+    log_max = numpy.maximum.reduceat(log_x, offsets)
+    log_y = log_x - numpy.repeat(log_max, counts)
+    mean_log_y = numpy.add.reduceat(log_y, offsets) / counts
+    if shape is None:
+        shape = 1.2825 / numpy.sqrt(numpy.add.reduceat(log_y * log_y, offsets) / counts - mean_log_y ** 2)
+    for _ in range(max_iter):
+        y_k = numpy.exp(numpy.repeat(shape, counts) * log_y)
+        s0 = numpy.add.reduceat(y_k, offsets)
+        s1 = numpy.add.reduceat(y_k * log_y, offsets)
+        s2 = numpy.add.reduceat(y_k * log_y * log_y, offsets)
+        g = s1 / s0 - 1 / shape - mean_log_y
+        dg = (s2 * s0 - s1 * s1) / (s0 * s0) + 1 / (shape * shape)
+        step = g / dg
+        step = numpy.where(shape - step <= 0, shape / 2, step)
+        shape = shape - step
+        if numpy.all(numpy.abs(step) < tolerance * shape):
+            break
+    scale = numpy.exp(log_max) * (numpy.add.reduceat(numpy.exp(numpy.repeat(shape, counts) * log_y), offsets) / counts) ** (1 / shape)
+    return shape, scale
+
+
+class IntervalIndex:
+    # time between consecutive failures, intervals are ordered by their start and end time
+    def __init__(self, failure_times: numpy.ndarray):
+        failure_times = numpy.sort(failure_times)
+        intervals = numpy.diff(failure_times)
+        positive = intervals > 0
+        self.starts = failure_times[:-1][positive]
+        self.ends = failure_times[1:][positive]
+        self.log_intervals = numpy.log(intervals[positive])
+        self.__log_sum = numpy.concatenate(([0.0], numpy.cumsum(self.log_intervals)))
+        self.__log_sq_sum = numpy.concatenate(([0.0], numpy.cumsum(self.log_intervals ** 2)))
+
+    def slice(self, start: float, end: float) -> typing.Tuple[int, int]:
+        return int(numpy.searchsorted(self.starts, start, side="left")), int(numpy.searchsorted(self.ends, end, side="right"))
+
+    def fit(self, start: float, end: float) -> dict:
+        first, last = self.slice(start, end)
+        count = max(last - first, 0)
+        result = dict(start=to_iso(start), end=to_iso(end), intervals=count, shape_parameter=None, scale_parameter=None)
+        if count < 2:
+            return result
+        mean_log = (self.__log_sum[last] - self.__log_sum[first]) / count
+        var_log = (self.__log_sq_sum[last] - self.__log_sq_sum[first]) / count - mean_log ** 2
+        if var_log <= 0:
+            return result
+        shape, scale = solve_mle(self.log_intervals[first:last], numpy.zeros(1, dtype=int), numpy.array([1.2825 / numpy.sqrt(var_log)]))
+        result["shape_parameter"] = float(shape[0])
+        result["scale_parameter"] = float(scale[0])
+        return result
+
+
+def code_key(code) -> str:
+    if isinstance(code, (float, numpy.floating)) and float(code).is_integer():
+        return str(int(code))
+    return str(code)
+
+
+def fit_codes(df: pandas.DataFrame, time_col: str, errorcode_column: str, min_events: int = 3, exclude_codes: typing.Sequence = no_error_codes) -> dict:
+    timestamps = get_timestamps(df, time_col)
+    codes = df[errorcode_column]
+    valid = (codes.notna() & ~codes.isin(exclude_codes)).values
+    labels, uniques = pandas.factorize(codes[valid])
+    timestamps = timestamps[valid]
+    order = numpy.lexsort((timestamps, labels))
+    labels = labels[order]
+    timestamps = timestamps[order]
+    events = numpy.bincount(labels, minlength=len(uniques))
+    intervals = numpy.diff(timestamps)
+    keep = (labels[1:] == labels[:-1]) & (intervals > 0)
+    interval_labels = labels[1:][keep]
+    log_x = numpy.log(intervals[keep])
+    interval_counts = numpy.bincount(interval_labels, minlength=len(uniques))
+    offsets = numpy.concatenate(([0], numpy.cumsum(interval_counts)[:-1]))
+    fit = (events >= min_events) & (interval_counts >= 2)
+    if fit.any():
+        nonempty = interval_counts > 0
+        log_sum = numpy.zeros(len(uniques))
+        log_sq_sum = numpy.zeros(len(uniques))
+        log_sum[nonempty] = numpy.add.reduceat(log_x, offsets[nonempty])
+        log_sq_sum[nonempty] = numpy.add.reduceat(log_x * log_x, offsets[nonempty])
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            fit &= log_sq_sum / interval_counts - (log_sum / interval_counts) ** 2 > 0
+    shapes = numpy.full(len(uniques), numpy.nan)
+    scales = numpy.full(len(uniques), numpy.nan)
+    if fit.any():
+        selected = numpy.repeat(fit, interval_counts)
+        shapes[fit], scales[fit] = solve_mle(log_x[selected], numpy.concatenate(([0], numpy.cumsum(interval_counts[fit])[:-1])))
+    result = dict()
+    for label, code in enumerate(uniques):
+        if events[label] >= min_events:
+            result[code_key(code)] = dict(
+                events=int(events[label]),
+                intervals=int(interval_counts[label]),
+                shape_parameter=float(shapes[label]) if fit[label] else None,
+                scale_parameter=float(scales[label]) if fit[label] else None
+            )
+    return result
+
+
+max_windows = 1000
+
+
+def is_positive(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 < value < float("inf")
+
+
+def validate_windows(windows):
+    if not isinstance(windows, dict) or not set(windows) <= {"horizons", "rolling"}:
+        raise ValueError("windows must contain 'horizons' and/or 'rolling'")
+    if "horizons" in windows:
+        if not isinstance(windows["horizons"], list) or not all(is_positive(days) for days in windows["horizons"]):
+            raise ValueError("horizons must be a list of positive numbers")
+    if "rolling" in windows:
+        rolling = windows["rolling"]
+        if not isinstance(rolling, dict) or not set(rolling) <= {"size", "step"} or not is_positive(rolling.get("size")):
+            raise ValueError("rolling must contain a positive 'size'")
+        if "step" in rolling and not is_positive(rolling["step"]):
+            raise ValueError("rolling step must be a positive number")
+
+
+def fit_windows(df: pandas.DataFrame, time_col: str, errorcode_column: str, errorcode, windows: dict) -> dict:
+    timestamps = get_timestamps(df, time_col)
+    data_start = float(timestamps.min())
+    data_end = float(timestamps.max())
+    index = IntervalIndex(timestamps[(df[errorcode_column] == errorcode).values])
+    series = dict()
+    if windows.get("horizons"):
+        series["horizons"] = [index.fit(max(data_end - days * 86400, data_start), data_end) for days in windows["horizons"]]
+    if windows.get("rolling"):
+        size = windows["rolling"]["size"] * 86400
+        step = windows["rolling"].get("step", windows["rolling"]["size"]) * 86400
+        if (data_end - data_start - size) / step + 1 > max_windows:
+            raise ValueError("rolling windows exceed limit of {}".format(max_windows))
+        series["rolling"] = list()
+        end = data_end
+        while end - size >= data_start or not series["rolling"]:
+            series["rolling"].append(index.fit(max(end - size, data_start), end))
+            end -= step
+        series["rolling"].reverse()
+    return series
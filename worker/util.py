@@ -14,12 +14,17 @@
    limitations under the License.
 """
 
-__all__ = ("Decompress", )
+__all__ = ("Decompress", "Spans", "Pipeline")
 
 
 import zlib
 import typing
 import hashlib
+import contextlib
+import resource
+import time
+import threading
+import queue
 
 
 def get_hash(service_id: str, config: dict) -> str:
@@ -29,6 +34,88 @@ def get_hash(service_id: str, config: dict) -> str:
     return hashlib.sha256(srv_conf_str.encode()).hexdigest()
 
 
+def is_timeout(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def get_status_value(pid: typing.Union[int, str], field: str) -> typing.Optional[int]:
+    try:
+        with open("/proc/{}/status".format(pid), "r") as file:
+            for line in file:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+
+def get_rss(pid: int) -> int:
+    return get_status_value(pid, "VmRSS:") or 0
+
+
+def get_peak_rss() -> int:
+    return get_status_value("self", "VmHWM:") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except Exception:
+        pass
+
+
+def get_io() -> typing.Tuple[int, int]:
+    rchar = wchar = 0
+    try:
+        with open("/proc/self/io", "r") as file:
+            for line in file:
+                if line.startswith("rchar:"):
+                    rchar = int(line.split()[1])
+                elif line.startswith("wchar:"):
+                    wchar = int(line.split()[1])
+    except Exception:
+        pass
+    return rchar, wchar
+
+
+class Spans:
+    # process resources are only recorded if the process runs nothing else, e.g. a job worker
+    def __init__(self, process_resources: bool = False):
+        self.stages: typing.Dict[str, dict] = dict()
+        self.peak_rss = 0
+        self.__process_resources = process_resources
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        if not self.__process_resources:
+            wall = time.perf_counter()
+            try:
+                yield
+            finally:
+                stage = self.stages.setdefault(name, dict(wall_time=0))
+                stage["wall_time"] += time.perf_counter() - wall
+            return
+        # peak rss is reset so that each span reports its own high-water mark
+        self.peak_rss = max(self.peak_rss, get_peak_rss())
+        reset_peak_rss()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        rchar, wchar = get_io()
+        try:
+            yield
+        finally:
+            rchar_end, wchar_end = get_io()
+            stage = self.stages.setdefault(name, dict(wall_time=0, cpu_time=0, bytes_read=0, bytes_written=0, peak_rss=0))
+            stage["wall_time"] += time.perf_counter() - wall
+            stage["cpu_time"] += time.process_time() - cpu
+            stage["bytes_read"] += rchar_end - rchar
+            stage["bytes_written"] += wchar_end - wchar
+            peak_rss = get_peak_rss()
+            self.peak_rss = max(self.peak_rss, peak_rss)
+            stage["peak_rss"] = max(stage["peak_rss"], peak_rss)
+
+
 class Decompress:
     def __init__(self, io_obj: typing.BinaryIO, wbits: int = zlib.MAX_WBITS | 16):
         self.__io_obj = io_obj
@@ -47,3 +134,55 @@ class Decompress:
 
     def __getattr__(self, attr):
         return getattr(self.__io_obj, attr)
+
+
+class Pipeline:
+    # buffers are filled by the calling thread and passed through stages running in separate threads
+    def __init__(self, buffer_size: int = 65536, buffers: int = 4):
+        self.__buffers = [bytearray(buffer_size) for _ in range(buffers)]
+
+    def __run_stage(self, stage: typing.Callable[[memoryview], typing.Any], in_queue: queue.Queue, out_queue: queue.Queue, errors: list):
+        while True:
+            item = in_queue.get()
+            if item is None:
+                out_queue.put(None)
+                return
+            buffer, size = item
+            if not errors:
+                try:
+                    stage(memoryview(buffer)[:size])
+                except Exception as ex:
+                    errors.append(ex)
+            out_queue.put(item)
+
+    def run(self, readinto: typing.Callable[[bytearray], int], stages: typing.Sequence[typing.Callable[[memoryview], typing.Any]]) -> int:
+        free = queue.Queue()
+        for buffer in self.__buffers:
+            free.put((buffer, 0))
+        queues = [queue.Queue() for _ in stages] + [free]
+        errors = list()
+        threads = [
+            threading.Thread(target=self.__run_stage, args=(stage, queues[num], queues[num + 1], errors), daemon=True)
+            for num, stage in enumerate(stages)
+        ]
+        for thread in threads:
+            thread.start()
+        total = 0
+        try:
+            while not errors:
+                item = free.get()
+                if item is None:
+                    continue
+                buffer = item[0]
+                size = readinto(buffer)
+                if not size:
+                    break
+                total += size
+                queues[0].put((buffer, size))
+        finally:
+            queues[0].put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return total